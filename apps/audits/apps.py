@@ -13,4 +13,5 @@ class AuditsConfig(AppConfig):
         from . import tasks  # noqa
 
         if settings.SYSLOG_ENABLE:
+            signal_handlers.enable_async_syslog()
             post_save.connect(signal_handlers.on_audits_log_create)
@@ -45,6 +45,9 @@ class OperatorLogHandler(metaclass=Singleton):
         before, after = {}, {}
         for key, value in right_dict.items():
             pre_value = left_dict.get(key, '')
+            # 值相等时直接跳过，避免字符串化和排序的开销
+            if pre_value == value:
+                continue
             pre_value, value = self._consistent_type_to_str(pre_value, value)
             if sorted(str(value)) == sorted(str(pre_value)):
                 continue
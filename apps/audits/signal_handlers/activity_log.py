@@ -80,7 +80,8 @@ def create_activities(resource_ids, detail, detail_id, action, org_id):
         for resource_id in resource_ids
     ]
     with tmp_to_org(org_id):
-        ActivityLog.objects.bulk_create(activities)
+        # 分批写入，避免资源数量过多时生成超大的单条 INSERT
+        ActivityLog.objects.bulk_create(activities, batch_size=1000)
     return activities
 
 
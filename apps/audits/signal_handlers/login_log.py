@@ -3,6 +3,7 @@
 
 from django.conf import settings
 from django.contrib.auth import BACKEND_SESSION_KEY
+from django.core.cache import cache
 from django.dispatch import receiver
 from django.utils import timezone, translation
 from django.utils.functional import LazyObject
@@ -14,7 +15,7 @@ from acls.notifications import UserLoginReminderMsg
 from audits.models import UserLoginLog
 from authentication.signals import post_auth_failed, post_auth_success
 from authentication.utils import check_different_city_login_if_need
-from common.utils import get_request_ip_or_data, get_logger
+from common.utils import get_request_ip, get_request_ip_or_data, get_logger
 from users.models import User
 from ..const import LoginTypeChoices
 from ..models import UserSession
@@ -26,21 +27,23 @@ logger = get_logger(__name__)
 class AuthBackendLabelMapping(LazyObject):
     @staticmethod
     def get_login_backends():
+        # 登录日志固定存英文，构建时就解析成英文 str，避免每次登录再切换语言
         backend_label_mapping = {}
-        for source, backends in User.SOURCE_BACKEND_MAPPING.items():
-            for backend in backends:
-                backend_label_mapping[backend] = source.label
-        backend_label_mapping[settings.AUTH_BACKEND_PUBKEY] = _("SSH Key")
-        backend_label_mapping[settings.AUTH_BACKEND_MODEL] = _("Password")
-        backend_label_mapping[settings.AUTH_BACKEND_SSO] = _("SSO")
-        backend_label_mapping[settings.AUTH_BACKEND_AUTH_TOKEN] = _("Auth Token")
-        backend_label_mapping[settings.AUTH_BACKEND_WECOM] = _("WeCom")
-        backend_label_mapping[settings.AUTH_BACKEND_FEISHU] = _("FeiShu")
-        backend_label_mapping[settings.AUTH_BACKEND_LARK] = 'Lark'
-        backend_label_mapping[settings.AUTH_BACKEND_SLACK] = _("Slack")
-        backend_label_mapping[settings.AUTH_BACKEND_DINGTALK] = _("DingTalk")
-        backend_label_mapping[settings.AUTH_BACKEND_TEMP_TOKEN] = _("Temporary token")
-        backend_label_mapping[settings.AUTH_BACKEND_PASSKEY] = _("Passkey")
+        with translation.override('en'):
+            for source, backends in User.SOURCE_BACKEND_MAPPING.items():
+                for backend in backends:
+                    backend_label_mapping[backend] = str(source.label)
+            backend_label_mapping[settings.AUTH_BACKEND_PUBKEY] = str(_("SSH Key"))
+            backend_label_mapping[settings.AUTH_BACKEND_MODEL] = str(_("Password"))
+            backend_label_mapping[settings.AUTH_BACKEND_SSO] = str(_("SSO"))
+            backend_label_mapping[settings.AUTH_BACKEND_AUTH_TOKEN] = str(_("Auth Token"))
+            backend_label_mapping[settings.AUTH_BACKEND_WECOM] = str(_("WeCom"))
+            backend_label_mapping[settings.AUTH_BACKEND_FEISHU] = str(_("FeiShu"))
+            backend_label_mapping[settings.AUTH_BACKEND_LARK] = 'Lark'
+            backend_label_mapping[settings.AUTH_BACKEND_SLACK] = str(_("Slack"))
+            backend_label_mapping[settings.AUTH_BACKEND_DINGTALK] = str(_("DingTalk"))
+            backend_label_mapping[settings.AUTH_BACKEND_TEMP_TOKEN] = str(_("Temporary token"))
+            backend_label_mapping[settings.AUTH_BACKEND_PASSKEY] = str(_("Passkey"))
         return backend_label_mapping
 
     def _setup(self):
@@ -51,13 +54,10 @@ AUTH_BACKEND_LABEL_MAPPING = AuthBackendLabelMapping()
 
 
 def get_login_backend(request):
-    backend = request.session.get('auth_backend', '') or \
-              request.session.get(BACKEND_SESSION_KEY, '')
-
-    backend_label = AUTH_BACKEND_LABEL_MAPPING.get(backend, None)
-    if backend_label is None:
-        backend_label = ''
-    return backend_label
+    session = request.session
+    backend = session.get('auth_backend') or \
+              session.get(BACKEND_SESSION_KEY) or ''
+    return AUTH_BACKEND_LABEL_MAPPING.get(backend) or ''
 
 
 def generate_data(username, request, login_type=None):
@@ -69,8 +69,7 @@ def generate_data(username, request, login_type=None):
     if login_type is None:
         login_type = 'W'
 
-    with translation.override('en'):
-        backend = str(get_login_backend(request))
+    backend = get_login_backend(request)
 
     data = {
         'username': username,
@@ -119,13 +118,29 @@ def send_login_info_to_reviewers(instance: UserLoginLog | str, auth_acl_id):
         UserLoginReminderMsg(reviewer, instance).publish_async()
 
 
+DIFFERENT_CITY_CHECKED_CACHE_KEY = 'AUDIT_DIFFERENT_CITY_CHECKED_{}_{}'
+DIFFERENT_CITY_CHECKED_TTL = 3600
+
+
+def check_different_city_login(user, request):
+    # 同一用户同网段短时间内重复登录，跳过异地登录检查的 GeoIP 查询
+    ip = get_request_ip(request) or '0.0.0.0'
+    subnet = ip.rsplit('.', 1)[0]
+    key = DIFFERENT_CITY_CHECKED_CACHE_KEY.format(user.id, subnet)
+    if cache.get(key):
+        return
+    check_different_city_login_if_need(user, request)
+    cache.set(key, 1, DIFFERENT_CITY_CHECKED_TTL)
+
+
 @receiver(post_auth_success)
 def on_user_auth_success(sender, user, request, login_type=None, **kwargs):
     logger.debug('User login success: {}'.format(user.username))
-    check_different_city_login_if_need(user, request)
+    check_different_city_login(user, request)
     username = f"{user.name}({user.username})"
     data = generate_data(username, request, login_type=login_type)
-    request.session['login_time'] = data['datetime'].strftime('%Y-%m-%d %H:%M:%S')
+    # isoformat 走 C 实现，截掉时区偏移后和原 strftime 的 'YYYY-MM-DD HH:MM:SS' 一致
+    request.session['login_time'] = data['datetime'].isoformat(sep=' ', timespec='seconds')[:19]
     data.update({'mfa': int(user.mfa_enabled), 'status': True})
     instance = write_login_log(**data)
     create_user_session(request, user.id, instance)
@@ -144,4 +159,9 @@ def on_user_auth_failed(sender, username, request, reason='', **kwargs):
     logger.debug('User login failed: {}'.format(username))
     data = generate_data(username, request)
     data.update({'reason': reason[:128], 'status': False})
-    write_login_log(**data)
+    if settings.AUDIT_USE_CELERY:
+        from ..tasks import write_login_log_async
+        data['datetime'] = data['datetime'].isoformat()
+        write_login_log_async.delay(**data)
+    else:
+        write_login_log(**data)
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 #
+import threading
 import uuid
+from functools import partial
 
 from django.apps import apps
+from django.db import connection, transaction
 from django.db.models.signals import (
     pre_delete, pre_save, m2m_changed, post_delete, post_save
 )
@@ -16,22 +19,35 @@ from audits.handler import (
 from audits.utils import model_to_dict_for_operate_log as model_to_dict
 from common.const.signals import POST_ADD, POST_REMOVE, POST_CLEAR, SKIP_SIGNAL
 from common.signals import django_ready
+from common.utils import get_logger
 from jumpserver.utils import current_request
+from users.models import UserGroup
 from ..const import MODELS_NEED_RECORD, ActionChoices
 
+logger = get_logger(__name__)
+
+# action -> (操作类型, 计算变更前成员的集合运算)，查一次表即可，无需再分支判断
 M2M_ACTION = {
-    POST_ADD: ActionChoices.create,
-    POST_REMOVE: ActionChoices.delete,
-    POST_CLEAR: ActionChoices.delete,
+    POST_ADD: (ActionChoices.create, set.difference),
+    POST_REMOVE: (ActionChoices.delete, set.symmetric_difference),
+    POST_CLEAR: (ActionChoices.delete, set.symmetric_difference),
+}
+
+# __str__ 只读取单个字段的模型，显示名直接用 values_list 取，
+# 免去整行传输和模型实例化；显示名依赖多个字段的模型仍取完整对象
+M2M_MODEL_DISPLAY_FIELD = {
+    UserGroup: 'name',
 }
 
 
 @receiver(m2m_changed)
 def on_m2m_changed(sender, action, instance, reverse, model, pk_set, **kwargs):
-    if action not in M2M_ACTION:
+    entry = M2M_ACTION.get(action)
+    if entry is None:
         return
     if not instance:
         return
+    action, diff_func = entry
 
     with translation.override('en'):
         resource_type = instance._meta.verbose_name
@@ -44,25 +60,26 @@ def on_m2m_changed(sender, action, instance, reverse, model, pk_set, **kwargs):
 
         field_name = str(model._meta.verbose_name)
         pk_set = pk_set or {}
-        objs = model.objects.filter(pk__in=pk_set)
-        objs_display = [str(o) for o in objs]
-        action = M2M_ACTION[action]
+        # 大批量变更时避免一次性加载全部对象，分批迭代控制内存
+        display_field = M2M_MODEL_DISPLAY_FIELD.get(model)
+        if display_field:
+            values = model.objects.filter(pk__in=pk_set) \
+                .values_list(display_field, flat=True).iterator(chunk_size=2000)
+            objs_display = [str(v) for v in values]
+        else:
+            objs = model.objects.filter(pk__in=pk_set).iterator(chunk_size=2000)
+            objs_display = [str(o) for o in objs]
         changed_field = current_instance.get(field_name, [])
 
-        after, before, before_value = None, None, None
-        if action == ActionChoices.create:
-            before_value = list(set(changed_field) - set(objs_display))
-        elif action == ActionChoices.delete:
-            before_value = list(
-                set(changed_field).symmetric_difference(set(objs_display))
-            )
+        after, before = None, None
+        before_value = list(diff_func(set(changed_field), set(objs_display)))
 
         if changed_field:
             after = {field_name: changed_field}
         if before_value:
             before = {field_name: before_value}
 
-        if sorted(str(before)) == sorted(str(after)):
+        if before == after or sorted(str(before)) == sorted(str(after)):
             return
 
         create_or_update_operate_log(
@@ -74,26 +91,25 @@ def on_m2m_changed(sender, action, instance, reverse, model, pk_set, **kwargs):
 def signal_of_operate_log_whether_continue(
         sender, instance, created, update_fields=None
 ):
-    condition = True
+    # 不在记录白名单中，跳过。绝大多数信号走到这里就返回
+    if sender not in MODELS_NEED_RECORD:
+        return False
     if not instance:
-        condition = False
-    if instance and getattr(instance, SKIP_SIGNAL, False):
-        condition = False
+        return False
+    if getattr(instance, SKIP_SIGNAL, False):
+        return False
     # 不记录组件的操作日志
     user = current_request.user if current_request else None
     if not user or getattr(user, 'is_service_account', False):
-        condition = False
+        return False
     # 终端模型的 create 事件由系统产生，不记录
     if instance._meta.object_name == 'Terminal' and created:
-        condition = False
+        return False
     # last_login 改变是最后登录日期, 每次登录都会改变
     if instance._meta.object_name == 'User' and \
             update_fields and 'last_login' in update_fields:
-        condition = False
-    # 不在记录白名单中，跳过
-    if sender._meta.object_name not in MODELS_NEED_RECORD:
-        condition = False
-    return condition
+        return False
+    return True
 
 
 @receiver([pre_save, pre_delete])
@@ -148,6 +164,46 @@ def on_object_created_or_update(
         )
 
 
+_delete_log_buffer = threading.local()
+
+
+def _flush_delete_operate_logs(entries):
+    if getattr(_delete_log_buffer, 'entries', None) is entries:
+        _delete_log_buffer.entries = None
+    with translation.override('en'):
+        for entry in entries:
+            # 此时事务已提交，单条日志失败只记录错误，不影响其余日志和调用方
+            try:
+                create_or_update_operate_log(**entry)
+            except Exception as e:
+                logger.error('Create delete operate log error: %s', e)
+
+
+def _flush_is_pending(entries):
+    # 事务（或保存点）回滚会丢弃 on_commit 回调，此时缓冲列表已失效，
+    # 不能继续复用，否则后续的删除日志会悄悄丢失
+    for item in connection.run_on_commit:
+        func = item[1]
+        if isinstance(func, partial) and \
+                func.func is _flush_delete_operate_logs and \
+                func.args and func.args[0] is entries:
+            return True
+    return False
+
+
+def _create_delete_operate_log(**kwargs):
+    # 级联删除会逐行触发 post_delete，把日志攒到事务提交后统一写，
+    # 避免在删除事务内夹杂大量审计写入；事务回滚时日志一并丢弃
+    if not connection.in_atomic_block:
+        create_or_update_operate_log(**kwargs)
+        return
+    entries = getattr(_delete_log_buffer, 'entries', None)
+    if entries is None or not _flush_is_pending(entries):
+        _delete_log_buffer.entries = entries = []
+        transaction.on_commit(partial(_flush_delete_operate_logs, entries))
+    entries.append(kwargs)
+
+
 @receiver(post_delete)
 def on_object_delete(sender, instance=None, **kwargs):
     ok = signal_of_operate_log_whether_continue(sender, instance, False)
@@ -162,8 +218,8 @@ def on_object_delete(sender, instance=None, **kwargs):
         log_id, before = get_instance_dict_from_cache(instance_id)
         if not log_id:
             log_id, before = None, model_to_dict(instance)
-        create_or_update_operate_log(
-            action, resource_type, log_id=log_id,
+        _create_delete_operate_log(
+            action=action, resource_type=resource_type, log_id=log_id,
             resource=instance, before=before,
         )
 
@@ -198,4 +254,5 @@ def on_django_start_set_operate_log_monitor_models(sender, **kwargs):
                 model_name.endswith('Execution'):
             if model_name not in include_models:
                 continue
-        MODELS_NEED_RECORD.add(model_name)
+        # 白名单存模型类本身，避免不同 app 重名模型误判，查找也更快
+        MODELS_NEED_RECORD.add(app)
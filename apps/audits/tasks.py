@@ -139,7 +139,7 @@ def clean_expired_session_period():
 )
 @register_as_period_task(crontab=CRONTAB_AT_AM_TWO)
 def clean_audits_log_period():
-    print("Start clean audit session task log")
+    logger.info("Start clean audit session task log")
     with tmp_to_root_org():
         clean_login_log_period()
         clean_operation_log_period()
@@ -178,3 +178,15 @@ def upload_ftp_file_to_external_storage(ftp_log_id, file_name):
     except:
         pass
     return
+
+
+@shared_task(
+    verbose_name=_('Write login log async'),
+    description=_(
+        """Write the user login log to the database asynchronously, 
+        it is used when AUDIT_USE_CELERY is enabled"""
+    )
+)
+def write_login_log_async(**data):
+    from .utils import write_login_log
+    write_login_log(**data)
@@ -86,7 +86,7 @@ def _get_instance_field_value(
                     str(f.verbose_name), {'name': getattr(f, 'column', ''), 'value': value}
                 )
             except Exception as e:
-                print(f.__dict__)
+                logger.error('Get operate log field value error: %s, field: %s', e, f.__dict__)
                 raise e
     return data
 
@@ -156,12 +156,21 @@ def is_uuid(seq):
 
 
 def get_request_ip(request):
+    # 同一请求内会被多个信号处理器调用，解析一次后缓存在 request 上
+    login_ip = getattr(request, '_request_ip', None)
+    if login_ip is not None:
+        return login_ip
+
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')
     if x_forwarded_for and x_forwarded_for[0]:
         login_ip = x_forwarded_for[0].split(":")[0]
-        return login_ip
+    else:
+        login_ip = request.META.get('REMOTE_ADDR', '')
 
-    login_ip = request.META.get('REMOTE_ADDR', '')
+    try:
+        request._request_ip = login_ip
+    except AttributeError:
+        pass
     return login_ip
 
 
@@ -615,6 +615,8 @@ class Config(dict):
         'GMSSL_ENABLED': False,
         # 操作日志变更字段的存储ES配置
         'OPERATE_LOG_ELASTICSEARCH_CONFIG': {},
+        # 审计日志是否使用 Celery 异步写入
+        'AUDIT_USE_CELERY': False,
         # Magnus 组件需要监听的 Oracle 端口范围
         'MAGNUS_ORACLE_PORTS': '30000-30030',
 
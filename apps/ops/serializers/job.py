@@ -35,11 +35,11 @@ class JobSerializer(BulkOrgResourceModelSerializer, PeriodTaskSerializerMixin):
 
     class Meta:
         model = Job
-        read_only_fields = [
+        read_only_fields = (
             "id", "date_last_run", "date_created",
             "date_updated", "average_time_cost"
-        ]
-        fields = read_only_fields + [
+        )
+        fields = read_only_fields + (
             "name", "instant", "type", "module",
             "args", "playbook", "assets",
             "runas_policy", "runas", "creator",
@@ -47,7 +47,7 @@ class JobSerializer(BulkOrgResourceModelSerializer, PeriodTaskSerializerMixin):
             "timeout", "chdir", "comment", "summary",
             "is_periodic", "interval", "crontab", "nodes",
             "run_after_save"
-        ]
+        )
         extra_kwargs = {
             'average_time_cost': {'label': _('Duration')},
         }
@@ -77,13 +77,13 @@ class JobExecutionSerializer(BulkOrgResourceModelSerializer):
 
     class Meta:
         model = JobExecution
-        read_only_fields = ["id", "task_id", "timedelta", "time_cost",
+        read_only_fields = ("id", "task_id", "timedelta", "time_cost",
                             'is_finished', 'date_start', 'date_finished',
                             'date_created', 'is_success', 'job_type',
-                            'summary', 'material']
-        fields = read_only_fields + [
+                            'summary', 'material')
+        fields = read_only_fields + (
             "job", "parameters", "creator"
-        ]
+        )
         extra_kwargs = {
             "task_id": {
                 "label": _("Task id"),